@@ -6,6 +6,7 @@ import sys
 import os
 import traceback
 import logging
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 # Configure logging
@@ -22,7 +23,7 @@ logger.info(f"Parent directory: {parent_dir}")
 logger.info(f"Python path: {sys.path}")
 
 try:
-    from sentiment_analyzer import SentimentAnalyzer
+    from sentiment_analyzer import DEFAULT_MAX_TOKENS, RequestHedger, ResultCache, SentimentAnalyzer
     logger.info("Successfully imported SentimentAnalyzer")
 except ImportError as e:
     logger.error(f"Import error: {e}")
@@ -32,7 +33,14 @@ except ImportError as e:
     logger.error(f"Files in parent directory: {os.listdir('..')}")
     raise
 
-app = FastAPI(title="Advanced Sentiment Analysis API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fill the keep-alive pool to the LLM endpoint before taking traffic
+    if os.getenv("SENTIMENT_WARM_UP", "").lower() in ("1", "true", "yes"):
+        analyzer.warm_up()
+    yield
+
+app = FastAPI(title="Advanced Sentiment Analysis API", lifespan=lifespan)
 
 # Configure CORS with specific origins
 origins = [
@@ -51,8 +59,49 @@ app.add_middleware(
 )
 
 # Initialize the sentiment analyzer
+# SENTIMENT_RESPONSE_MODE=lean switches to schema-constrained tool output,
+# SENTIMENT_SKIP_EXPLANATION=1 drops the free-form explanation and implications,
+# SENTIMENT_MAX_TOKENS_<STAGE> sets the output token budget of the router,
+# sentiment or comparison call,
+# SENTIMENT_HEDGE_PERCENTILE enables hedged LLM calls within SENTIMENT_HEDGE_BUDGET,
+# each attempt bounded by SENTIMENT_HEDGE_TIMEOUT seconds,
+# SENTIMENT_CACHE_PATH shares results between worker processes through SQLite for
+# SENTIMENT_CACHE_TTL seconds, keeping at most SENTIMENT_CACHE_MAX_ENTRIES,
+# SENTIMENT_POOL_CONNECTIONS keep-alive connections are kept to the LLM endpoint
+# for SENTIMENT_KEEPALIVE_EXPIRY seconds
 try:
-    analyzer = SentimentAnalyzer()
+    skip_explanation = os.getenv("SENTIMENT_SKIP_EXPLANATION", "").lower() in ("1", "true", "yes")
+    max_tokens = {
+        stage: int(os.environ[f"SENTIMENT_MAX_TOKENS_{stage.upper()}"])
+        for stage in DEFAULT_MAX_TOKENS
+        if os.getenv(f"SENTIMENT_MAX_TOKENS_{stage.upper()}")
+    }
+    hedge_percentile = os.getenv("SENTIMENT_HEDGE_PERCENTILE")
+    hedger = None
+    if hedge_percentile:
+        hedger = RequestHedger(
+            percentile=float(hedge_percentile),
+            budget=float(os.getenv("SENTIMENT_HEDGE_BUDGET", "0.05")),
+            timeout=float(os.getenv("SENTIMENT_HEDGE_TIMEOUT", "30"))
+        )
+    cache_path = os.getenv("SENTIMENT_CACHE_PATH")
+    cache = None
+    if cache_path:
+        cache = ResultCache(
+            cache_path,
+            ttl=float(os.getenv("SENTIMENT_CACHE_TTL", "86400")),
+            max_entries=int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", "100000"))
+        )
+    analyzer = SentimentAnalyzer(
+        response_mode=os.getenv("SENTIMENT_RESPONSE_MODE", "full"),
+        include_explanation=not skip_explanation,
+        include_implications=not skip_explanation,
+        max_tokens=max_tokens,
+        hedger=hedger,
+        cache=cache,
+        pool_connections=int(os.getenv("SENTIMENT_POOL_CONNECTIONS", "16")),
+        keepalive_expiry=float(os.getenv("SENTIMENT_KEEPALIVE_EXPIRY", "300"))
+    )
     logger.info("Successfully initialized SentimentAnalyzer")
 except Exception as e:
     logger.error(f"Error initializing SentimentAnalyzer: {e}")
@@ -73,7 +122,7 @@ class AnalysisResponse(BaseModel):
     confidence: float
     implications: Optional[List[str]] = None
     comparison: Optional[AttributeComparison] = None
-    explanation: str
+    explanation: Optional[str] = None
 
 @app.get("/")
 async def root():
@@ -83,8 +132,17 @@ async def root():
 async def health_check():
     return {"status": "healthy", "message": "API is running"}
 
+@app.get("/api/stats")
+async def stats():
+    return {
+        "pid": os.getpid(),
+        "hedging": analyzer.hedger.stats() if analyzer.hedger else None,
+        "cache": analyzer.cache.stats() if analyzer.cache else None
+    }
+
+# A plain def runs in the threadpool, so blocking LLM calls don't stall the event loop
 @app.post("/api/analyze", response_model=AnalysisResponse)
-async def analyze_text(request: TextAnalysisRequest):
+def analyze_text(request: TextAnalysisRequest):
     try:
         logger.info(f"Received request: {request}")
         
@@ -101,7 +159,7 @@ async def analyze_text(request: TextAnalysisRequest):
                     sentiment=result["sentiment"],
                     confidence=result["confidence"],
                     implications=result.get("implications", []),
-                    explanation=result["explanation"]
+                    explanation=result.get("explanation")
                 )
             except Exception as e:
                 logger.error(f"Error in sentiment analysis: {e}")
@@ -118,7 +176,7 @@ async def analyze_text(request: TextAnalysisRequest):
                     sentiment=result["sentiment"],
                     confidence=result["confidence"],
                     comparison=result["comparison"],
-                    explanation=result["explanation"]
+                    explanation=result.get("explanation")
                 )
             except Exception as e:
                 logger.error(f"Error in comparison analysis: {e}")
@@ -135,17 +193,35 @@ async def analyze_text(request: TextAnalysisRequest):
 
 # For Vercel serverless deployment
 if __name__ == "__main__":
+    import argparse
     import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the sentiment analysis API")
+    parser.add_argument("--production", action="store_true",
+                        help="serve with several pre-warmed worker processes, without auto-reload")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                        help="number of worker processes in production mode")
+    parser.add_argument("--port", type=int, default=3001)
+    args = parser.parse_args()
+
+    if args.production:
+        # Workers inherit the environment, so each one warms its own connection
+        # pool on startup and, when SENTIMENT_CACHE_PATH is set, they all open
+        # the same cache file
+        os.environ.setdefault("SENTIMENT_WARM_UP", "1")
+
     try:
         uvicorn.run(
             "main:app",
+            app_dir=current_dir,
             host="0.0.0.0",
-            port=3001,
-            reload=True,
+            port=args.port,
+            reload=not args.production,
+            workers=args.workers if args.production else None,
             ssl_keyfile=None,
             ssl_certfile=None,
             log_level="info"
         )
     except Exception as e:
         logger.error(f"Error starting server: {e}")
-        logger.error(traceback.format_exc()) 
\ No newline at end of file
+        logger.error(traceback.format_exc())
@@ -0,0 +1,180 @@
+"""
+Benchmark output tokens and latency per request for the analyzer response modes.
+
+A fake chat model stands in for Claude: it answers the router with 'yes'/'no',
+writes compact JSON (with explanation and implications) when asked for free-form
+output, wrapping every fourth reply in prose, and fills only the schema fields
+when a tool is bound. Output is truncated to max_tokens and latency is simulated
+per returned output token, so the numbers track what output length costs
+against the real API.
+
+The baseline row uses the parser as it was before the prose fallback, so
+prose-wrapped replies count as errors there just as they did in production.
+
+Usage:
+    python benchmarks/bench_response_modes.py [--ms-per-token 2] [--rounds 3]
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.messages import AIMessage  # noqa: E402
+from sentiment_analyzer import SentimentAnalyzer  # noqa: E402
+
+TEXTS = [
+    "I absolutely love this new restaurant!",
+    "The movie was interesting, to say the least.",
+    "The food was great but the service was terrible.",
+    "The new iPhone is faster but more expensive than the Samsung.",
+]
+
+EXPLANATION = (
+    "The text uses strongly evaluative language and the overall tone points in one direction. "
+    "Following the classification rules, the presence of these words determines the label, "
+    "and there are no factual statements that would balance the sentiment towards neutral."
+)
+IMPLICATIONS = [
+    "The author is likely to share this opinion with others",
+    "The experience differed from what the author expected",
+    "There may be an underlying comparison with previous experiences",
+]
+
+
+def count_tokens(text: str) -> int:
+    # Roughly four characters per token for English text and JSON
+    return max(1, len(text) // 4)
+
+
+class FakeChatModel:
+    """Fake chat model that simulates output-token-proportional latency"""
+
+    def __init__(self, ms_per_token: float, tools=None):
+        self.ms_per_token = ms_per_token
+        self.tools = tools
+        self.output_tokens = 0
+        self.replies = 0
+
+    def bind_tools(self, tools, tool_choice=None):
+        bound = FakeChatModel(self.ms_per_token, tools)
+        bound.parent = self
+        return bound
+
+    def _record(self, tokens: int):
+        time.sleep(tokens * self.ms_per_token / 1000)
+        getattr(self, "parent", self).output_tokens += tokens
+        return tokens
+
+    def _text_reply(self, content: str, max_tokens):
+        if max_tokens is not None:
+            content = content[:max_tokens * 4]
+        tokens = self._record(count_tokens(content))
+        return AIMessage(content=content, usage_metadata=_usage(tokens))
+
+    def invoke(self, messages, max_tokens=None, **kwargs):
+        if isinstance(messages, str):
+            text = messages.rsplit("Text:", 1)[-1]
+            return self._text_reply("yes" if " than " in text else "no", max_tokens)
+
+        system = messages[0][1]
+        if self.tools:
+            tool = self.tools[0]
+            if tool["name"] == "record_comparison":
+                args = {"object1": "iPhone", "object2": "Samsung", "attributes": {"speed": "faster", "price": "higher"}}
+            else:
+                properties = tool["input_schema"]["properties"]
+                args = {"sentiment": "positive", "confidence": 0.9}
+                if "implications" in properties:
+                    args["implications"] = IMPLICATIONS
+                if "explanation" in properties:
+                    args["explanation"] = EXPLANATION
+            tokens = count_tokens(json.dumps(args))
+            if max_tokens is not None and tokens > max_tokens:
+                # A truncated tool call carries no usable arguments
+                return AIMessage(content="", usage_metadata=_usage(self._record(max_tokens)))
+            return AIMessage(
+                content="",
+                tool_calls=[{"name": tool["name"], "args": args, "id": "call_0"}],
+                usage_metadata=_usage(self._record(tokens))
+            )
+
+        if "objects_being_compared" in system:
+            body = {
+                "objects_being_compared": [{"name": "iPhone"}, {"name": "Samsung"}],
+                "attributes": {"iPhone": {"explicit_attributes": {"speed": "faster", "price": "higher"}}},
+            }
+        else:
+            body = {"sentiment": "positive", "confidence": 0.9}
+            if "implications:" in system:
+                body["implications"] = IMPLICATIONS
+            if "explanation:" in system:
+                body["explanation"] = EXPLANATION
+        # Same compact JSON as the tool-call arguments, so the comparison only
+        # measures the schema and the dropped fields
+        content = f"```json\n{json.dumps(body)}\n```"
+        self.replies += 1
+        if self.replies % 4 == 0:
+            content = f"Here is my analysis of the text.\n{content}\nLet me know if you need more detail."
+        return self._text_reply(content, max_tokens)
+
+
+class BaselineAnalyzer(SentimentAnalyzer):
+    """Analyzer with the parser as it was before the prose fallback"""
+
+    def _parse_response(self, response: str):
+        stripped = response
+        if stripped.startswith('```json'):
+            stripped = stripped[7:]
+        if stripped.endswith('```'):
+            stripped = stripped[:-3]
+        try:
+            json.loads(stripped.strip())
+        except json.JSONDecodeError:
+            return {"sentiment": "error", "confidence": 0.0, "explanation": "Invalid JSON response from LLM"}
+        return super()._parse_response(response)
+
+
+def _usage(output_tokens: int):
+    return {"input_tokens": 0, "output_tokens": output_tokens, "total_tokens": output_tokens}
+
+
+def run(name: str, ms_per_token: float, rounds: int, baseline: bool = False, **options):
+    llm = FakeChatModel(ms_per_token)
+    analyzer = (BaselineAnalyzer if baseline else SentimentAnalyzer)(llm=llm, **options)
+    if baseline:
+        analyzer.max_tokens = {stage: None for stage in analyzer.max_tokens}
+    latencies, tokens, errors = [], [], 0
+    for _ in range(rounds):
+        for text in TEXTS:
+            before = llm.output_tokens
+            start = time.perf_counter()
+            result = analyzer.analyze(text)
+            latencies.append((time.perf_counter() - start) * 1000)
+            tokens.append(llm.output_tokens - before)
+            errors += result.get("sentiment") == "error"
+    print(f"{name:<36} {statistics.mean(tokens):>10.1f} {statistics.mean(latencies):>12.1f} "
+          f"{max(latencies):>10.1f} {errors:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ms-per-token", type=float, default=2.0, help="simulated decode time per output token")
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the sample texts")
+    args = parser.parse_args()
+    logging.getLogger("sentiment_analyzer").setLevel(logging.WARNING)
+
+    print(f"{'configuration':<36} {'out tok/req':>10} {'mean ms/req':>12} {'max ms':>10} {'errors':>7}")
+    run("baseline (previous parser, no caps)", args.ms_per_token, args.rounds, baseline=True)
+    run("full", args.ms_per_token, args.rounds)
+    run("lean", args.ms_per_token, args.rounds, response_mode="lean")
+    run("lean, no explanation/implications", args.ms_per_token, args.rounds,
+        response_mode="lean", include_explanation=False, include_implications=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Local stand-in for the Anthropic Messages API, for load testing the backend.
+
+Every POST /v1/messages sleeps for a fixed latency and answers like the real
+API: 'no' to the comparison router, a sentiment JSON object to analysis
+prompts, and a tool_use block when tools are bound. GET /v1/models answers
+immediately so connection warm-up works against it.
+
+Usage:
+    python benchmarks/fake_llm_server.py [--port 8787] [--latency 0.2]
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SENTIMENT = {"sentiment": "positive", "confidence": 0.9, "implications": [], "explanation": "Positive wording"}
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.startswith("/v1/models"):
+            self._send_json({"data": [{"id": "fake-model", "type": "model", "display_name": "Fake",
+                                       "created_at": "2025-01-01T00:00:00Z"}],
+                             "has_more": False, "first_id": "fake-model", "last_id": "fake-model"})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        self.server.record_request()
+        time.sleep(self.server.latency)
+
+        prompt = json.dumps(request.get("messages", []))
+        if request.get("tools"):
+            tool = request["tools"][0]
+            content = [{"type": "tool_use", "id": "toolu_fake", "name": tool["name"],
+                        "input": {"sentiment": "positive", "confidence": 0.9}}]
+            stop_reason = "tool_use"
+        elif "yes' or 'no'" in prompt:
+            content = [{"type": "text", "text": "no"}]
+            stop_reason = "end_turn"
+        else:
+            content = [{"type": "text", "text": json.dumps(SENTIMENT)}]
+            stop_reason = "end_turn"
+        self._send_json({
+            "id": "msg_fake", "type": "message", "role": "assistant", "model": request.get("model", "fake-model"),
+            "content": content, "stop_reason": stop_reason, "stop_sequence": None,
+            "usage": {"input_tokens": 10, "output_tokens": 10},
+        })
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.2):
+        super().__init__(("127.0.0.1", port), FakeLLMHandler)
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self) -> "FakeLLMServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Anthropic Messages API")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per messages call")
+    args = parser.parse_args()
+    server = FakeLLMServer(args.port, args.latency)
+    print(f"Fake LLM server listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
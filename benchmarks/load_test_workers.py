@@ -0,0 +1,116 @@
+"""
+Load test showing how API throughput scales with the number of worker processes.
+
+Starts a fake LLM server, then for each worker count runs the backend in
+production mode against it and fires concurrent /api/analyze requests with
+unique texts. A second pass repeats the same texts to show that results
+computed by any worker are served from the shared cache by every worker
+without reaching the LLM.
+
+Each worker serves requests from its threadpool, so one worker is already
+concurrent; extra workers add capacity only while free CPU cores remain,
+and the fake server and client share the same machine.
+
+Usage:
+    python benchmarks/load_test_workers.py [--workers 1 2 4] [--requests 512] [--concurrency 128]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_llm_server import FakeLLMServer  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_backend(workers: int, port: int, llm_url: str, cache_path: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "ANTHROPIC_API_KEY": "fake-key",
+        "ANTHROPIC_API_URL": llm_url,
+        "ANTHROPIC_BASE_URL": llm_url,
+        "SENTIMENT_CACHE_PATH": cache_path,
+    }
+    return subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "backend", "main.py"), "--production",
+         "--workers", str(workers), "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def wait_until_ready(client: httpx.Client, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if client.get("/health").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Backend did not become ready")
+
+
+def fire(client: httpx.Client, texts, concurrency: int) -> float:
+    def post(text):
+        response = client.post("/api/analyze", json={"text": text, "analysis_type": "sentiment"})
+        response.raise_for_status()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(post, texts))
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, default=128)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per fake LLM call")
+    args = parser.parse_args()
+
+    llm = FakeLLMServer(latency=args.latency).start()
+    print(f"Fake LLM at {llm.url}, {args.latency * 1000:.0f} ms per call, 2 calls per uncached request, "
+          f"{os.cpu_count()} CPU cores, concurrency {args.concurrency}")
+    print(f"{'workers':>7} {'req/s':>8} {'cached req/s':>13} {'LLM calls':>10} {'cached LLM calls':>17}")
+
+    for workers in args.workers:
+        port = free_port()
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = start_backend(workers, port, llm.url, os.path.join(tmp, "cache.sqlite3"))
+            limits = httpx.Limits(max_keepalive_connections=args.concurrency)
+            try:
+                with httpx.Client(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+                    wait_until_ready(client)
+                    texts = [f"Load test {workers}-{i}: I love this product!" for i in range(args.requests)]
+                    before = llm.requests
+                    throughput = fire(client, texts, args.concurrency)
+                    uncached_calls = llm.requests - before
+                    before = llm.requests
+                    cached_throughput = fire(client, texts, args.concurrency)
+                    cached_calls = llm.requests - before
+            finally:
+                backend.terminate()
+                backend.wait(timeout=30)
+        print(f"{workers:>7} {throughput:>8.1f} {cached_throughput:>13.1f} {uncached_calls:>10} {cached_calls:>17}")
+
+    llm.shutdown()
+
+
+if __name__ == "__main__":
+    main()
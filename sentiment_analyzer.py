@@ -1,10 +1,20 @@
-from typing import Dict, List, Tuple, Optional
+from typing import Awaitable, Callable, Deque, Dict, List, Tuple, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 from langchain_anthropic import ChatAnthropic
 from langchain.memory import ConversationBufferMemory
 from langchain_core.messages import HumanMessage, AIMessage
 import os
 import json
+import asyncio
+import hashlib
 import logging
+import sqlite3
+import threading
+import time
+import anthropic
+import httpx
 from dotenv import load_dotenv
 
 # Configure logging
@@ -14,21 +24,387 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# "full" asks for a free-form JSON reply, "lean" forces a tool call against a
+# strict schema so the model only generates the fields we actually read
+RESPONSE_MODES = ("full", "lean")
+
+# Output token budget for each LLM call, None keeps the model default.
+# The router only ever needs to answer 'yes' or 'no'.
+DEFAULT_MAX_TOKENS = {
+    "router": 5,
+    "sentiment": None,
+    "comparison": None,
+}
+
+# With explanation and implications skipped, the lean sentiment tool call is
+# just a label and a number, so a fixed budget bounds it with room to spare.
+# Free-text fields and comparison attributes are unbounded and keep the model
+# default, since a truncated tool call comes back as an error result.
+LEAN_MAX_TOKENS = {
+    "sentiment": 512,
+}
+
+ROUTER_PROMPT = """Does the following text contain a direct comparison between two or more distinct objects/entities?
+Examples of comparisons:
+- "The iPhone is faster than the Samsung"
+- "Product A has better features than Product B"
+- "Company X's revenue is higher than Company Y's"
+
+Examples of non-comparisons:
+- "The food was great but the service was terrible" (mixed sentiment)
+- "I like both options" (general statement)
+- "The movie was interesting, to say the least" (implication)
+
+Text: {text}
+Answer with just 'yes' or 'no'."""
+
+SENTIMENT_RULES = """You are a sentiment analysis expert. Your task is to classify text as positive, negative, or neutral.
+
+Rules for classification:
+1. NEGATIVE: Text containing words like 'worst', 'terrible', 'hate', 'awful', 'bad', 'poor', 'disappointing'
+2. POSITIVE: Text containing words like 'love', 'great', 'excellent', 'amazing', 'wonderful', 'best'
+3. NEUTRAL: Text that is factual or contains mixed sentiments
+
+You must strictly follow these rules. If the text contains any negative words, it MUST be classified as negative."""
+
+COMPARISON_RULES = """You are an expert at analyzing comparisons between objects in text.
+
+When analyzing text, identify:
+1. The objects being compared
+2. Their respective attributes
+3. The comparison relationship
+4. The sentiment towards each object"""
+
+COMPARISON_JSON_FORMAT = """Return a JSON object with this structure:
+{
+    "objects_being_compared": [
+        {"name": "object1_name"},
+        {"name": "object2_name"}
+    ],
+    "attributes": {
+        "object1_name": {
+            "explicit_attributes": {
+                "attribute1": "value1",
+                "attribute2": "value2"
+            }
+        }
+    }
+}"""
+
+SENTIMENT_TOOL_INSTRUCTION = "Record your classification with the record_sentiment tool."
+
+COMPARISON_TOOL_INSTRUCTION = "Record your analysis with the record_comparison tool."
+
+COMPARISON_TOOL = {
+    "name": "record_comparison",
+    "description": "Record the two objects being compared and the attributes they are compared on.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "object1": {"type": "string"},
+            "object2": {"type": "string"},
+            "attributes": {
+                "type": "object",
+                "description": "Attribute name mapped to a one or two word value",
+                "additionalProperties": {"type": "string"}
+            }
+        },
+        "required": ["object1", "object2", "attributes"],
+        "additionalProperties": False
+    }
+}
+
+
+class PooledChatAnthropic(ChatAnthropic):
+    """
+    ChatAnthropic with its own HTTP connection pool. The SDK default pool drops
+    idle keep-alive connections after 5 seconds; this one keeps
+    `pool_connections` of them for `keepalive_expiry` seconds so connections
+    warmed at startup survive quiet periods.
+    """
+
+    pool_connections: int = 16
+    keepalive_expiry: float = 300.0
+
+    def _http_client_kwargs(self) -> Dict:
+        # Mirrors langchain_anthropic's default client (base URL, timeout and
+        # proxy), changing only the keep-alive settings of the SDK's limits
+        client_params = self._client_params
+        kwargs = {
+            "base_url": client_params["base_url"],
+            "limits": httpx.Limits(
+                max_connections=anthropic.DEFAULT_CONNECTION_LIMITS.max_connections,
+                max_keepalive_connections=self.pool_connections,
+                keepalive_expiry=self.keepalive_expiry
+            )
+        }
+        if "timeout" in client_params:
+            kwargs["timeout"] = client_params["timeout"]
+        if self.anthropic_proxy:
+            kwargs["proxy"] = self.anthropic_proxy
+        return kwargs
+
+    @cached_property
+    def _client(self) -> anthropic.Client:
+        return anthropic.Client(
+            **self._client_params, http_client=anthropic.DefaultHttpxClient(**self._http_client_kwargs())
+        )
+
+    @cached_property
+    def _async_client(self) -> anthropic.AsyncClient:
+        return anthropic.AsyncClient(
+            **self._client_params, http_client=anthropic.DefaultAsyncHttpxClient(**self._http_client_kwargs())
+        )
+
+
+class RequestHedger:
+    """
+    Hedges LLM calls against upstream stalls: once a call has run longer than
+    the given percentile of recent latencies for its stage, one duplicate is
+    fired and whichever answers first is returned.
+
+    Attempts run as asyncio tasks on a background event loop, so cancelling
+    the loser closes its HTTP request. Every attempt is also bounded by
+    `timeout` seconds. Hedges are capped at `budget` times the number of calls.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        window: int = 200,
+        min_samples: int = 20,
+        budget: float = 0.05,
+        timeout: float = 30.0
+    ):
+        if not 0 < percentile < 100:
+            raise ValueError(f"percentile must be between 0 and 100, got {percentile}")
+        if budget < 0:
+            raise ValueError(f"budget must not be negative, got {budget}")
+
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.budget = budget
+        self.timeout = timeout
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="llm-hedge", daemon=True).start()
+
+    def hedge_delay(self, stage: str) -> Optional[float]:
+        """
+        Seconds to wait before hedging a call of this stage, or None while
+        there are too few samples to estimate the percentile
+        """
+        with self._lock:
+            samples = sorted(self._latencies.get(stage, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return samples[index]
+
+    def stats(self) -> Dict:
+        """
+        Hedge counters and the current hedge delay of each stage
+        """
+        with self._lock:
+            stages = list(self._latencies)
+            stats = {
+                "calls": self.calls,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "hedge_rate": self.hedges / self.calls if self.calls else 0.0,
+            }
+        stats["hedge_delays"] = {stage: self.hedge_delay(stage) for stage in stages}
+        return stats
+
+    def run(self, coro: Awaitable):
+        """
+        Run a coroutine on the hedger's event loop and wait for its result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _record(self, stage: str, latency: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(stage, deque(maxlen=self.window)).append(latency)
+
+    async def _timed(self, stage: str, make_call: Callable[[], Awaitable]):
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(make_call(), self.timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            # Cancelled losers and timeouts record their elapsed time as a lower
+            # bound, so stalls stay in the histogram instead of only fast winners
+            self._record(stage, time.perf_counter() - start)
+            raise
+        self._record(stage, time.perf_counter() - start)
+        return result
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    async def _hedged(self, stage: str, make_call: Callable[[], Awaitable]):
+        delay = self.hedge_delay(stage)
+        primary = asyncio.ensure_future(self._timed(stage, make_call))
+        if delay is None:
+            return await primary
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done or not self._take_budget():
+            return await primary
+
+        logger.info(f"Hedging {stage} call after {delay:.3f}s")
+        hedge = asyncio.ensure_future(self._timed(stage, make_call))
+        attempts = [primary, hedge]
+        pending = set(attempts)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for attempt in sorted(done, key=attempts.index):
+                if attempt.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if attempt is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return attempt.result()
+                error = attempt.exception()
+        raise error
+
+    def call(self, stage: str, make_call: Callable[[], Awaitable]):
+        """
+        Await the coroutine returned by make_call, hedging it with one
+        duplicate if it is slower than usual
+        """
+        with self._lock:
+            self.calls += 1
+        return self.run(self._hedged(stage, make_call))
+
+
+class ResultCache:
+    """
+    Analysis results stored in an SQLite database in WAL mode. Worker processes
+    opening the same file share it, so a result computed by one worker is a hit
+    in every other.
+
+    Entries older than `ttl` seconds are ignored and pruned, and the table is
+    trimmed to the newest `max_entries` rows every `prune_interval` writes.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = 86400.0, max_entries: int = 100000, prune_interval: int = 100):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prune_interval = prune_interval
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_results (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analysis_results_created ON analysis_results (created)")
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl if self.ttl is not None else float("-inf")
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM analysis_results WHERE key = ? AND created >= ?", (key, self._cutoff())
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_results (key, value, created) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+            self._writes += 1
+            if self._writes % self.prune_interval == 0:
+                self._prune()
+
+    def _prune(self) -> None:
+        self._conn.execute("DELETE FROM analysis_results WHERE created < ?", (self._cutoff(),))
+        self._conn.execute(
+            "DELETE FROM analysis_results WHERE key IN "
+            "(SELECT key FROM analysis_results ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def stats(self) -> Dict:
+        """
+        Hit and miss counters of this process
+        """
+        with self._lock:
+            return {"path": self.path, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
 class SentimentAnalyzer:
-    def __init__(self):
-        # Check for API key
+    def __init__(
+        self,
+        llm=None,
+        response_mode: str = "full",
+        max_tokens: Optional[Dict[str, Optional[int]]] = None,
+        include_explanation: bool = True,
+        include_implications: bool = True,
+        hedger: Optional[RequestHedger] = None,
+        cache: Optional[ResultCache] = None,
+        pool_connections: int = 16,
+        keepalive_expiry: float = 300.0
+    ):
+        if response_mode not in RESPONSE_MODES:
+            raise ValueError(f"response_mode must be one of {RESPONSE_MODES}, got {response_mode!r}")
+        unknown_stages = set(max_tokens or {}) - set(DEFAULT_MAX_TOKENS)
+        if unknown_stages:
+            raise ValueError(f"Unknown max_tokens stages: {sorted(unknown_stages)}")
+
+        self.response_mode = response_mode
+        bounded_output = response_mode == "lean" and not include_explanation and not include_implications
+        self.max_tokens = {
+            **DEFAULT_MAX_TOKENS,
+            **(LEAN_MAX_TOKENS if bounded_output else {}),
+            **(max_tokens or {})
+        }
+        self.include_explanation = include_explanation
+        self.include_implications = include_implications
+        self.hedger = hedger
+        self.cache = cache
+
+        # Check for API key unless a model was supplied
         api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
+        if llm is None and not api_key:
             logger.error("ANTHROPIC_API_KEY environment variable is not set")
             raise ValueError("ANTHROPIC_API_KEY environment variable is not set")
             
         try:
             # Initialize the LLM with Claude
-            self.llm = ChatAnthropic(
+            self.llm = llm or PooledChatAnthropic(
                 model="claude-sonnet-4-20250514",
                 temperature=0,
-                anthropic_api_key=api_key
+                anthropic_api_key=api_key,
+                pool_connections=pool_connections,
+                keepalive_expiry=keepalive_expiry
             )
+            self._cache_version = self._fingerprint()
             
             # Initialize the memory
             self.memory = ConversationBufferMemory(
@@ -40,31 +416,123 @@ class SentimentAnalyzer:
             logger.error(f"Error initializing SentimentAnalyzer: {e}")
             raise
     
+    def warm_up(self, connections: Optional[int] = None) -> None:
+        """
+        Open pooled keep-alive connections to the LLM endpoint ahead of the
+        first request by sending cheap concurrent requests through the client.
+        Defaults to filling the model's keep-alive pool.
+        """
+        connections = connections or getattr(self.llm, "pool_connections", 0)
+        if not connections or not hasattr(self.llm, "_client"):
+            return
+        try:
+            if self.hedger is not None:
+                # Hedged calls go through the async client on the hedger's loop
+                client = self.llm._async_client
+
+                async def ping_all():
+                    await asyncio.gather(*(client.models.list(limit=1) for _ in range(connections)))
+
+                self.hedger.run(ping_all())
+            else:
+                client = self.llm._client
+                with ThreadPoolExecutor(max_workers=connections) as executor:
+                    list(executor.map(lambda _: client.models.list(limit=1), range(connections)))
+            logger.info(f"Warmed up {connections} connections to the LLM endpoint")
+        except Exception as e:
+            logger.warning(f"Connection warm-up failed: {e}")
+
+    def _fingerprint(self) -> str:
+        """
+        Internal method hashing the model, prompts and output settings, so
+        cached results are not reused once any of them change
+        """
+        settings = [
+            getattr(self.llm, "model", type(self.llm).__name__),
+            ROUTER_PROMPT, SENTIMENT_RULES, SENTIMENT_TOOL_INSTRUCTION, self._sentiment_tool(),
+            COMPARISON_RULES, COMPARISON_JSON_FORMAT, COMPARISON_TOOL_INSTRUCTION, COMPARISON_TOOL,
+            self.response_mode, self.include_explanation, self.include_implications, self.max_tokens
+        ]
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _cache_key(self, text: str) -> str:
+        return hashlib.sha256(json.dumps([self._cache_version, text]).encode("utf-8")).hexdigest()
+
+    def _invoke(self, stage: str, messages, tool: Optional[Dict] = None):
+        """
+        Internal method to call the LLM with the output token budget of a stage,
+        optionally forcing a call to the given tool and hedging slow calls
+        """
+        kwargs = {}
+        if self.max_tokens.get(stage) is not None:
+            kwargs["max_tokens"] = self.max_tokens[stage]
+        llm = self.llm
+        if tool is not None:
+            llm = llm.bind_tools([tool], tool_choice=tool["name"])
+        if self.hedger is not None:
+            return self.hedger.call(stage, lambda: llm.ainvoke(messages, **kwargs))
+        return llm.invoke(messages, **kwargs)
+
+    def _sentiment_fields(self) -> Dict[str, Tuple[Dict, str]]:
+        """
+        Internal method returning the sentiment output fields as
+        name -> (JSON schema, prompt description)
+        """
+        fields = {
+            "sentiment": ({"type": "string", "enum": ["positive", "negative", "neutral"]},
+                          '"positive", "negative", or "neutral"'),
+            "confidence": ({"type": "number", "minimum": 0, "maximum": 1},
+                           "number between 0 and 1"),
+        }
+        if self.include_implications:
+            fields["implications"] = ({"type": "array", "items": {"type": "string"}},
+                                      "list of any hidden meanings")
+        if self.include_explanation:
+            fields["explanation"] = ({"type": "string"},
+                                     "brief explanation of your classification")
+        return fields
+
+    def _sentiment_tool(self) -> Dict:
+        """
+        Internal method building the strict tool schema used in lean mode
+        """
+        fields = self._sentiment_fields()
+        return {
+            "name": "record_sentiment",
+            "description": "Record the sentiment classification of the text.",
+            "input_schema": {
+                "type": "object",
+                "properties": {name: schema for name, (schema, _) in fields.items()},
+                "required": list(fields),
+                "additionalProperties": False
+            }
+        }
+
     def _analyze_sentiment(self, text: str) -> Dict:
         """
         Internal method to analyze sentiment using the LLM
         """
         try:
+            if self.response_mode == "lean":
+                messages = [
+                    ("system", f"{SENTIMENT_RULES}\n\n{SENTIMENT_TOOL_INSTRUCTION}"),
+                    ("human", f"Analyze this text: {text}")
+                ]
+                logger.info(f"Sending lean sentiment analysis request for text: {text}")
+                response = self._invoke("sentiment", messages, tool=self._sentiment_tool())
+                logger.info(f"Received sentiment analysis tool calls: {response.tool_calls}")
+                return self._validate_sentiment(self._tool_args(response))
+
+            field_lines = "\n".join(
+                f"- {name}: {description}" for name, (_, description) in self._sentiment_fields().items()
+            )
             messages = [
-                ("system", """You are a sentiment analysis expert. Your task is to classify text as positive, negative, or neutral.
-                
-                Rules for classification:
-                1. NEGATIVE: Text containing words like 'worst', 'terrible', 'hate', 'awful', 'bad', 'poor', 'disappointing'
-                2. POSITIVE: Text containing words like 'love', 'great', 'excellent', 'amazing', 'wonderful', 'best'
-                3. NEUTRAL: Text that is factual or contains mixed sentiments
-                
-                You must strictly follow these rules. If the text contains any negative words, it MUST be classified as negative.
-                
-                Return a JSON object with these fields:
-                - sentiment: "positive", "negative", or "neutral"
-                - confidence: number between 0 and 1
-                - implications: list of any hidden meanings
-                - explanation: brief explanation of your classification"""),
+                ("system", f"{SENTIMENT_RULES}\n\nReturn a JSON object with these fields:\n{field_lines}"),
                 ("human", f"Analyze this text: {text}")
             ]
             
             logger.info(f"Sending sentiment analysis request for text: {text}")
-            response = self.llm.invoke(messages)
+            response = self._invoke("sentiment", messages)
             logger.info(f"Received sentiment analysis response: {response.content}")
             return self._parse_response(response.content)
         except Exception as e:
@@ -76,40 +544,63 @@ class SentimentAnalyzer:
         Internal method to analyze comparisons between objects
         """
         try:
+            if self.response_mode == "lean":
+                messages = [
+                    ("system", f"{COMPARISON_RULES}\n\n{COMPARISON_TOOL_INSTRUCTION}"),
+                    ("human", f"Analyze this text: {text}")
+                ]
+                logger.info(f"Sending lean comparison analysis request for text: {text}")
+                response = self._invoke("comparison", messages, tool=COMPARISON_TOOL)
+                logger.info(f"Received comparison analysis tool calls: {response.tool_calls}")
+                args = self._tool_args(response)
+                if not args or "object1" not in args or "object2" not in args:
+                    logger.warning(f"LLM tool call did not contain expected keys. Tool call: {args}")
+                    return {"sentiment": "error", "confidence": 0.0, "explanation": "Failed to parse LLM response"}
+                return self._format_comparison(args["object1"], args["object2"], args.get("attributes", {}))
+
             messages = [
-                ("system", """You are an expert at analyzing comparisons between objects in text.
-                
-                When analyzing text, identify:
-                1. The objects being compared
-                2. Their respective attributes
-                3. The comparison relationship
-                4. The sentiment towards each object
-                
-                Return a JSON object with this structure:
-                {
-                    "objects_being_compared": [
-                        {"name": "object1_name"},
-                        {"name": "object2_name"}
-                    ],
-                    "attributes": {
-                        "object1_name": {
-                            "explicit_attributes": {
-                                "attribute1": "value1",
-                                "attribute2": "value2"
-                            }
-                        }
-                    }
-                }"""),
+                ("system", f"{COMPARISON_RULES}\n\n{COMPARISON_JSON_FORMAT}"),
                 ("human", f"Analyze this text: {text}")
             ]
             
             logger.info(f"Sending comparison analysis request for text: {text}")
-            response = self.llm.invoke(messages)
+            response = self._invoke("comparison", messages)
             logger.info(f"Received comparison analysis response: {response.content}")
             return self._parse_response(response.content)
         except Exception as e:
             logger.error(f"Error in comparison analysis: {e}")
             raise
+
+    def _tool_args(self, response) -> Optional[Dict]:
+        """
+        Internal method returning the arguments of the first tool call, if any
+        """
+        tool_calls = getattr(response, "tool_calls", None) or []
+        return tool_calls[0].get("args") if tool_calls else None
+
+    def _format_comparison(self, object1: str, object2: str, explicit_attributes: Dict) -> Dict:
+        """
+        Internal method building the comparison result returned to callers
+        """
+        return {
+            "comparison": {
+                "object1": object1,
+                "object2": object2,
+                "attributes": {
+                    attr: {object1: value, object2: value}
+                    for attr, value in explicit_attributes.items()
+                }
+            }
+        }
+
+    def _validate_sentiment(self, parsed_data: Optional[Dict]) -> Dict:
+        """
+        Internal method checking a sentiment result has the required fields
+        """
+        if parsed_data and "sentiment" in parsed_data and "confidence" in parsed_data:
+            return parsed_data
+        logger.warning(f"LLM response did not contain expected keys. Response: {parsed_data}")
+        return {"sentiment": "error", "confidence": 0.0, "explanation": "Failed to parse LLM response"}
     
     def _parse_response(self, response: str) -> Dict:
         try:
@@ -122,35 +613,32 @@ class SentimentAnalyzer:
             
             logger.info(f"Parsing response: {response}")
             
-            # Parse the JSON response
-            parsed_data = json.loads(response)
+            # Parse the JSON response, falling back to the outermost object
+            # when the model wrapped it in prose
+            try:
+                parsed_data = json.loads(response)
+            except json.JSONDecodeError:
+                start, end = response.find("{"), response.rfind("}")
+                if start == -1 or end <= start:
+                    raise
+                parsed_data = json.loads(response[start:end + 1])
             
             # For comparison analysis, ensure we have the right structure
             if "objects_being_compared" in parsed_data:
                 try:
-                    return {
-                        "comparison": {
-                            "object1": parsed_data["objects_being_compared"][0].get("name", ""),
-                            "object2": parsed_data["objects_being_compared"][1].get("name", ""),
-                            "attributes": {
-                                attr: {
-                                    parsed_data["objects_being_compared"][0].get("name", ""): value,
-                                    parsed_data["objects_being_compared"][1].get("name", ""): value
-                                }
-                                for attr, value in parsed_data.get("attributes", {}).get(parsed_data["objects_being_compared"][0].get("name", ""), {}).get("explicit_attributes", {}).items()
-                            }
-                        }
-                    }
+                    objects = parsed_data["objects_being_compared"]
+                    object1 = objects[0].get("name", "")
+                    object2 = objects[1].get("name", "")
+                    explicit_attributes = (
+                        parsed_data.get("attributes", {}).get(object1, {}).get("explicit_attributes", {})
+                    )
+                    return self._format_comparison(object1, object2, explicit_attributes)
                 except Exception as e:
                     logger.error(f"Comparison parsing error: {e}, response: {parsed_data}")
                     return {"sentiment": "error", "confidence": 0.0, "explanation": f"Comparison parsing error: {e}"}
             
             # For sentiment analysis, ensure we have the required fields
-            if "sentiment" in parsed_data and "confidence" in parsed_data:
-                return parsed_data
-            else:
-                logger.warning(f"LLM response did not contain expected keys. Response: {response}")
-                return {"sentiment": "error", "confidence": 0.0, "explanation": "Failed to parse LLM response"}
+            return self._validate_sentiment(parsed_data)
                 
         except json.JSONDecodeError:
             logger.error(f"Could not decode JSON from LLM response: {response}")
@@ -169,28 +657,27 @@ class SentimentAnalyzer:
                 raise ValueError("Input text cannot be empty")
                 
             # Determine if the text contains a comparison
-            comparison_prompt = f"""Does the following text contain a direct comparison between two or more distinct objects/entities?
-            Examples of comparisons:
-            - "The iPhone is faster than the Samsung"
-            - "Product A has better features than Product B"
-            - "Company X's revenue is higher than Company Y's"
-            
-            Examples of non-comparisons:
-            - "The food was great but the service was terrible" (mixed sentiment)
-            - "I like both options" (general statement)
-            - "The movie was interesting, to say the least" (implication)
-            
-            Text: {text}
-            Answer with just 'yes' or 'no'."""
+            comparison_prompt = ROUTER_PROMPT.format(text=text)
             
+            if self.cache is not None:
+                cache_key = self._cache_key(text)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"Cache hit for text: {text}")
+                    return cached
+
             logger.info(f"Checking if text contains comparison: {text}")
-            is_comparison = self.llm.invoke(comparison_prompt).content.strip().lower() == 'yes'
+            is_comparison = self._invoke("router", comparison_prompt).content.strip().lower() == 'yes'
             logger.info(f"Is comparison: {is_comparison}")
             
             if is_comparison:
-                return self._analyze_comparison(text)
+                result = self._analyze_comparison(text)
             else:
-                return self._analyze_sentiment(text)
+                result = self._analyze_sentiment(text)
+
+            if self.cache is not None and result.get("sentiment") != "error":
+                self.cache.set(cache_key, result)
+            return result
         except Exception as e:
             logger.error(f"Error in analyze method: {e}")
             raise
@@ -1,7 +1,13 @@
 import pytest
-from sentiment_analyzer import SentimentAnalyzer
+from sentiment_analyzer import PooledChatAnthropic, RequestHedger, ResultCache, SentimentAnalyzer
 import os
+import asyncio
 import json
+import threading
+import time
+from types import SimpleNamespace
+import anthropic
+from langchain_core.messages import AIMessage
 
 # Skip tests if API key is not present
 skip_if_no_api_key = pytest.mark.skipif(
@@ -114,4 +120,305 @@ def test_implications(analyzer):
     # Test text with implications
     result = analyzer.analyze("The movie was interesting, to say the least.")
     assert "implications" in result
-    assert isinstance(result["implications"], list) 
\ No newline at end of file
+    assert isinstance(result["implications"], list) 
+
+class FakeChatModel:
+    """Stand-in for ChatAnthropic that replays canned replies and records each call"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+        self.tools = None
+
+    def bind_tools(self, tools, tool_choice=None):
+        bound = FakeChatModel(self.replies)
+        bound.calls = self.calls
+        bound.tools = tools
+        return bound
+
+    def invoke(self, messages, **kwargs):
+        self.calls.append({"tools": self.tools, "kwargs": kwargs})
+        return self.replies.pop(0)
+
+    async def ainvoke(self, messages, **kwargs):
+        return self.invoke(messages, **kwargs)
+
+
+def test_router_is_capped():
+    llm = FakeChatModel([
+        AIMessage(content="no"),
+        AIMessage(content='{"sentiment": "positive", "confidence": 0.9, "explanation": "love"}'),
+    ])
+    result = SentimentAnalyzer(llm=llm).analyze("I love it")
+    assert result["sentiment"] == "positive"
+    assert llm.calls[0]["kwargs"] == {"max_tokens": 5}
+    # Full mode keeps the model default for the analysis stage
+    assert llm.calls[1] == {"tools": None, "kwargs": {}}
+
+
+def test_lean_sentiment_uses_tool_schema():
+    llm = FakeChatModel([
+        AIMessage(content="no"),
+        AIMessage(content="", tool_calls=[{
+            "name": "record_sentiment", "args": {"sentiment": "negative", "confidence": 0.8}, "id": "1"
+        }]),
+    ])
+    analyzer = SentimentAnalyzer(
+        llm=llm, response_mode="lean", max_tokens={"sentiment": 40},
+        include_explanation=False, include_implications=False
+    )
+    result = analyzer.analyze("The experience was terrible.")
+    assert result == {"sentiment": "negative", "confidence": 0.8}
+    tool = llm.calls[1]["tools"][0]
+    assert tool["name"] == "record_sentiment"
+    assert tool["input_schema"]["required"] == ["sentiment", "confidence"]
+    assert llm.calls[1]["kwargs"] == {"max_tokens": 40}
+
+
+def test_lean_comparison_uses_tool_schema():
+    llm = FakeChatModel([
+        AIMessage(content="yes"),
+        AIMessage(content="", tool_calls=[{
+            "name": "record_comparison",
+            "args": {"object1": "iPhone", "object2": "Samsung", "attributes": {"speed": "faster"}},
+            "id": "1"
+        }]),
+    ])
+    result = SentimentAnalyzer(llm=llm, response_mode="lean").analyze("The iPhone is faster than the Samsung.")
+    # Comparison attributes are free text, so no default budget applies
+    assert llm.calls[1]["kwargs"] == {}
+    assert result["comparison"]["object1"] == "iPhone"
+    assert result["comparison"]["object2"] == "Samsung"
+    assert "speed" in result["comparison"]["attributes"]
+
+
+def test_lean_default_budget_only_without_free_text():
+    assert SentimentAnalyzer(llm=FakeChatModel([]), response_mode="lean").max_tokens["sentiment"] is None
+    bounded = SentimentAnalyzer(
+        llm=FakeChatModel([]), response_mode="lean", include_explanation=False, include_implications=False
+    )
+    assert bounded.max_tokens["sentiment"] == 512
+
+
+def test_lean_missing_tool_call():
+    llm = FakeChatModel([AIMessage(content="no"), AIMessage(content="positive")])
+    result = SentimentAnalyzer(llm=llm, response_mode="lean").analyze("I love it")
+    assert result["sentiment"] == "error"
+
+
+def test_parse_response_with_prose():
+    analyzer = SentimentAnalyzer(llm=FakeChatModel([]))
+    result = analyzer._parse_response('Here is the analysis: {"sentiment": "neutral", "confidence": 0.7} Hope it helps.')
+    assert result["sentiment"] == "neutral"
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        SentimentAnalyzer(llm=FakeChatModel([]), response_mode="terse")
+    with pytest.raises(ValueError):
+        SentimentAnalyzer(llm=FakeChatModel([]), max_tokens={"summary": 10})
+
+
+def reply(value, delay=0.0):
+    async def call():
+        await asyncio.sleep(delay)
+        return value
+    return call
+
+
+def make_hedger(**kwargs):
+    # Warm the histogram with fast calls so the hedge delay is known
+    hedger = RequestHedger(min_samples=5, **kwargs)
+    for _ in range(5):
+        hedger.call("sentiment", reply("fast"))
+    return hedger
+
+
+def test_hedger_waits_for_samples():
+    hedger = RequestHedger(min_samples=5, budget=1.0)
+    assert hedger.hedge_delay("sentiment") is None
+    assert hedger.call("sentiment", reply("ok")) == "ok"
+    assert hedger.stats()["hedges"] == 0
+
+
+def test_hedger_hedges_stalled_call():
+    hedger = make_hedger(budget=1.0)
+    stalls = iter([True, False])
+    cancelled = threading.Event()
+
+    async def call():
+        if next(stalls):
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "stalled"
+        return "hedged"
+
+    start = time.perf_counter()
+    assert hedger.call("sentiment", call) == "hedged"
+    assert time.perf_counter() - start < 10
+    stats = hedger.stats()
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+    # The stalled attempt is cancelled rather than left running
+    assert cancelled.wait(timeout=10)
+
+
+def test_hedger_keeps_stalls_in_histogram():
+    hedger = RequestHedger(min_samples=5, window=5, budget=1.0)
+    for _ in range(5):
+        hedger.call("sentiment", reply("normal", 0.05))
+    delay = hedger.hedge_delay("sentiment")
+    attempts = iter(range(100))
+
+    async def call():
+        # Primaries stall, hedges answer at once
+        if next(attempts) % 2 == 0:
+            await asyncio.sleep(30)
+        return "hedged"
+
+    for _ in range(5):
+        assert hedger.call("sentiment", call) == "hedged"
+    assert hedger.stats()["hedge_wins"] == 5
+    # Cancelled primaries record at least the hedge delay, so the delay does not fall
+    assert hedger.hedge_delay("sentiment") >= delay * 0.9
+
+
+def test_hedger_respects_budget():
+    hedger = make_hedger(budget=0.0)
+    assert hedger.call("sentiment", reply("slow", 0.05)) == "slow"
+    assert hedger.stats()["hedges"] == 0
+
+
+def test_hedger_times_out_stalled_calls():
+    hedger = RequestHedger(timeout=0.1)
+    start = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        hedger.call("sentiment", reply("stalled", 5.0))
+    assert time.perf_counter() - start < 1.0
+
+
+def test_hedger_propagates_errors():
+    hedger = make_hedger(budget=1.0)
+
+    async def call():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream failed")
+
+    with pytest.raises(RuntimeError):
+        hedger.call("sentiment", call)
+
+
+def test_analyzer_routes_calls_through_hedger():
+    llm = FakeChatModel([
+        AIMessage(content="no"),
+        AIMessage(content='{"sentiment": "neutral", "confidence": 0.7}'),
+    ])
+    hedger = RequestHedger()
+    SentimentAnalyzer(llm=llm, hedger=hedger).analyze("The weather is cloudy today.")
+    assert hedger.stats()["calls"] == 2
+
+
+def test_result_cache_is_shared(tmp_path):
+    # Two connections to the same file stand in for two worker processes
+    path = str(tmp_path / "cache.sqlite3")
+    writer, reader = ResultCache(path), ResultCache(path)
+    assert reader.get("key") is None
+    writer.set("key", {"sentiment": "positive", "confidence": 0.9})
+    assert reader.get("key") == {"sentiment": "positive", "confidence": 0.9}
+    assert reader.stats()["hits"] == 1
+    assert reader.stats()["misses"] == 1
+
+
+def test_analyzer_serves_cached_results(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    llm = FakeChatModel([
+        AIMessage(content="no"),
+        AIMessage(content='{"sentiment": "positive", "confidence": 0.9}'),
+    ])
+    first = SentimentAnalyzer(llm=llm, cache=ResultCache(path)).analyze("I love it")
+    second = SentimentAnalyzer(llm=FakeChatModel([]), cache=ResultCache(path)).analyze("I love it")
+    assert second == first
+    # Results depend on the response options, so they are cached separately
+    lean = SentimentAnalyzer(llm=FakeChatModel([AIMessage(content="no"), AIMessage(content="")]),
+                             response_mode="lean", cache=ResultCache(path))
+    assert lean.analyze("I love it")["sentiment"] == "error"
+
+
+def test_analyzer_does_not_cache_errors(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"))
+    llm = FakeChatModel([AIMessage(content="no"), AIMessage(content="not json")])
+    assert SentimentAnalyzer(llm=llm, cache=cache).analyze("I love it")["sentiment"] == "error"
+    llm = FakeChatModel([
+        AIMessage(content="no"),
+        AIMessage(content='{"sentiment": "positive", "confidence": 0.9}'),
+    ])
+    assert SentimentAnalyzer(llm=llm, cache=cache).analyze("I love it")["sentiment"] == "positive"
+
+
+def test_cache_key_covers_model_settings():
+    default = SentimentAnalyzer(llm=FakeChatModel([]))
+    capped = SentimentAnalyzer(llm=FakeChatModel([]), max_tokens={"sentiment": 50})
+    assert default._cache_key("I love it") == SentimentAnalyzer(llm=FakeChatModel([]))._cache_key("I love it")
+    assert default._cache_key("I love it") != capped._cache_key("I love it")
+
+
+def test_result_cache_expires_and_trims(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"), ttl=0.05, max_entries=2, prune_interval=1)
+    cache.set("old", {"sentiment": "positive", "confidence": 0.9})
+    time.sleep(0.1)
+    assert cache.get("old") is None
+    for key in ("a", "b", "c"):
+        cache.set(key, {"sentiment": "positive", "confidence": 0.9})
+    count = cache._conn.execute("SELECT COUNT(*) FROM analysis_results").fetchone()[0]
+    assert count == 2
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+
+
+def test_pooled_client_keeps_proxy_and_limits():
+    llm = PooledChatAnthropic(
+        model="claude-sonnet-4-20250514", anthropic_api_key="test-key",
+        anthropic_proxy="http://proxy.invalid:3128", pool_connections=3, keepalive_expiry=60.0
+    )
+    for http_client in (llm._client._client, llm._async_client._client):
+        # The proxy is mounted like in the default client, and the pool only
+        # changes the keep-alive settings of the SDK's limits
+        assert len(http_client._mounts) == 1
+        pool = next(iter(http_client._mounts.values()))._pool
+        assert pool._max_connections == anthropic.DEFAULT_CONNECTION_LIMITS.max_connections
+        assert pool._max_keepalive_connections == 3
+        assert pool._keepalive_expiry == 60.0
+
+
+class FakeModels:
+    def __init__(self):
+        self.calls = 0
+
+    def list(self, limit):
+        self.calls += 1
+
+
+class FakeAsyncModels(FakeModels):
+    async def list(self, limit):
+        self.calls += 1
+
+
+def test_warm_up_fills_pool():
+    llm = FakeChatModel([])
+    llm.pool_connections = 3
+    llm._client = SimpleNamespace(models=FakeModels())
+    SentimentAnalyzer(llm=llm).warm_up()
+    assert llm._client.models.calls == 3
+
+
+def test_warm_up_uses_async_client_when_hedging():
+    llm = FakeChatModel([])
+    llm.pool_connections = 4
+    llm._client = SimpleNamespace(models=FakeModels())
+    llm._async_client = SimpleNamespace(models=FakeAsyncModels())
+    SentimentAnalyzer(llm=llm, hedger=RequestHedger()).warm_up()
+    assert llm._async_client.models.calls == 4
+    assert llm._client.models.calls == 0